@@ -5,6 +5,9 @@
 import logging
 import os
 import shutil
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
 
 from ops.charm import CharmBase
 from ops.main import main
@@ -15,8 +18,6 @@ from ops.model import (
     # BlockedStatus,
 )
 
-from jinja2 import Template
-
 # from typing import Dict, Any
 
 from utils import (
@@ -26,9 +27,11 @@ from utils import (
     service_restart,
     service_enable,
     systemctl_daemon_reload,
-    install_apt,
+    update_apt_cache,
+    install_apt_packages,
     git_clone,
-    shell,
+    run_command,
+    remove_default_gw,
     copy_files,
     is_ipv4,
     ip_from_default_iface,
@@ -86,9 +89,35 @@ SRS_UE_BINARY = f"{BUILD_PATH}/srsue/src/srsue"
 SRS_UE_SERVICE_TEMPLATE = "./templates/srsue.service"
 SRS_UE_SERVICE_PATH = "/etc/systemd/system/srsue.service"
 
-SRS_ENB_UE_BUILD_COMMAND = (
-    f"cd {BUILD_PATH} && cmake {SRC_PATH} && make -j `nproc` srsenb srsue"
+# The config-file arguments never change at runtime, so they are folded
+# into ready-made strings instead of being re-interpolated on every
+# command rebuild.
+SRS_ENB_FILE_ARGS = (
+    f'--enb_files.rr_config={CONFIG_PATHS["rr"]} '
+    f'--enb_files.sib_config={CONFIG_PATHS["sib"]} '
+    f'--enb_files.drb_config={CONFIG_PATHS["drb"]} '
+    f'{CONFIG_PATHS["enb"]}'
 )
+SRS_UE_FILE_ARG = CONFIG_PATHS["ue"]
+
+SRS_ENB_UE_CMAKE_COMMAND = ["cmake", SRC_PATH]
+SRS_ENB_UE_MAKE_COMMAND = ["make", f"-j{os.cpu_count()}", "srsenb", "srsue"]
+
+
+# The service templates substitute a single {command} placeholder into an
+# otherwise static file, so plain str.format covers them. Each Juju hook
+# runs in a fresh process and most hooks (update-status in particular)
+# never render a unit file, so the templates are read lazily on first
+# use and cached for the rest of the process.
+_service_templates = {}
+
+
+def _get_service_template(path: str) -> str:
+    template = _service_templates.get(path)
+    if template is None:
+        with open(path, "r") as template_file:
+            template = _service_templates[path] = template_file.read()
+    return template
 
 
 class SrsLteCharm(CharmBase):
@@ -97,15 +126,20 @@ class SrsLteCharm(CharmBase):
     def __init__(self, *args):
         super().__init__(*args)
 
+        self._daemon_reload_pending = False
+
         self._stored.set_default(
             mme_addr=None,
-            bind_addr=None,
             ue_usim_imsi=None,
             ue_usim_k=None,
             ue_usim_opc=None,
             installed=False,
             started=False,
             ue_attached=False,
+            cached_srsenb_cmd=None,
+            cached_srsenb_cmd_key=None,
+            cached_srsue_cmd=None,
+            cached_srsue_cmd_key=None,
         )
 
         # Basic hooks
@@ -125,19 +159,27 @@ class SrsLteCharm(CharmBase):
         # Relations hooks
         self.framework.observe(self.on.mme_relation_changed, self._mme_relation_changed)
 
+        # Flush any deferred daemon-reload once per dispatch
+        self.framework.observe(self.framework.on.commit, self._on_framework_commit)
+
     # Basic hooks
     def _on_install(self, _):
-        self.unit.status = MaintenanceStatus("Installing apt packages")
-        install_apt(packages=APT_REQUIREMENTS, update=True)
-
-        self.unit.status = MaintenanceStatus("Preparing the environment")
-        self._reset_environment()
-
-        self.unit.status = MaintenanceStatus("Downloading srsLTE from Github")
+        self.unit.status = MaintenanceStatus(
+            "Installing apt packages and downloading srsLTE"
+        )
+        # The apt work only touches the package database, so it can run
+        # concurrently with the environment reset. The clone has to wait
+        # for both: the reset recreates its target folder and the apt
+        # install provides git itself (a fresh unit may not have it).
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            apt_future = executor.submit(self._install_apt_requirements)
+            self._reset_environment()
+            apt_future.result()
         git_clone(GIT_REPO, output_folder=SRC_PATH, branch=GIT_REPO_TAG, depth=1)
 
         self.unit.status = MaintenanceStatus("Building srsLTE")
-        shell(SRS_ENB_UE_BUILD_COMMAND)
+        run_command(SRS_ENB_UE_CMAKE_COMMAND, cwd=BUILD_PATH)
+        run_command(SRS_ENB_UE_MAKE_COMMAND, cwd=BUILD_PATH)
 
         self.unit.status = MaintenanceStatus("Generating configuration files")
         copy_files(origin=CONFIG_ORIGIN_PATHS, destination=CONFIG_PATHS)
@@ -149,6 +191,11 @@ class SrsLteCharm(CharmBase):
         service_enable(SRS_ENB_SERVICE)
         self._stored.installed = True
 
+    @staticmethod
+    def _install_apt_requirements():
+        update_apt_cache()
+        install_apt_packages(APT_REQUIREMENTS)
+
     def _on_start(self, _):
         self.unit.status = MaintenanceStatus("Starting srsenb")
         service_start(SRS_ENB_SERVICE)
@@ -162,11 +209,11 @@ class SrsLteCharm(CharmBase):
         self.unit.status = self._get_current_status()
 
     def _on_config_changed(self, _):
-        self._stored.bind_addr = self._get_bind_address()
         self._configure_srsenb_service()
         # Restart the service only if it is running
         if self._stored.started:
             self.unit.status = MaintenanceStatus("Reloading srsenb")
+            self._flush_daemon_reload()
             service_restart(SRS_ENB_SERVICE)
         self.unit.status = self._get_current_status()
 
@@ -179,6 +226,7 @@ class SrsLteCharm(CharmBase):
         self._stored.ue_usim_k = event.params["usim-k"]
         self._stored.ue_usim_opc = event.params["usim-opc"]
         self._configure_srsue_service()
+        self._flush_daemon_reload()
         service_restart(SRS_UE_SERVICE)
         self._stored.ue_attached = True
         self.unit.status = self._get_current_status()
@@ -195,7 +243,7 @@ class SrsLteCharm(CharmBase):
         event.set_results({"status": "ok", "message": "Detached successfully"})
 
     def _on_remove_default_gw_action(self, event):
-        shell("route del default")
+        remove_default_gw()
         event.set_results({"status": "ok", "message": "Default route removed!"})
 
     # Relation hooks
@@ -210,6 +258,7 @@ class SrsLteCharm(CharmBase):
             # Restart the service only if it is running
             if self._stored.started:
                 self.unit.status = MaintenanceStatus("Reloading srsenb")
+                self._flush_daemon_reload()
                 service_restart(SRS_ENB_SERVICE)
         self.unit.status = self._get_current_status()
 
@@ -230,59 +279,113 @@ class SrsLteCharm(CharmBase):
     def _configure_service(
         self, command: str, service_template: str, service_path: str
     ):
-        with open(service_template, "r") as template:
-            service_content = Template(template.read()).render(command=command)
-            with open(service_path, "w") as service:
-                service.write(service_content)
+        template = _get_service_template(service_template)
+        service_content = template.format(command=command)
+        # If the rendered file is byte-identical to what is on disk there
+        # is nothing for systemd to pick up: skip the write and the
+        # (expensive) daemon-reload entirely.
+        if os.path.exists(service_path):
+            with open(service_path, "r") as service:
+                if service.read() == service_content:
+                    return
+        with open(service_path, "w") as service:
+            service.write(service_content)
+        self._daemon_reload_pending = True
+
+    def _flush_daemon_reload(self):
+        # daemon-reload walks every unit on disk, so it is deferred and
+        # run at most once per dispatch: before any service restart that
+        # needs the new unit files, and otherwise at framework commit.
+        if self._daemon_reload_pending:
+            self._daemon_reload_pending = False
             systemctl_daemon_reload()
 
+    def _on_framework_commit(self, _):
+        self._flush_daemon_reload()
+
     def _get_srsenb_command(self):
-        srsenb_command = [SRS_ENB_BINARY]
-        if self._stored.mme_addr:
-            srsenb_command.append(f"--enb.mme_addr={self._stored.mme_addr}")
-        if self._stored.bind_addr:
-            srsenb_command.append(f"--enb.gtp_bind_addr={self._stored.bind_addr}")
-            srsenb_command.append(f"--enb.s1c_bind_addr={self._stored.bind_addr}")
-        srsenb_command.append(f'--enb.name={self.config.get("enb-name")}')
-        srsenb_command.append(f'--enb.mcc={self.config.get("enb-mcc")}')
-        srsenb_command.append(f'--enb.mnc={self.config.get("enb-mnc")}')
-        srsenb_command.append(f'--enb_files.rr_config={CONFIG_PATHS["rr"]}')
-        srsenb_command.append(f'--enb_files.sib_config={CONFIG_PATHS["sib"]}')
-        srsenb_command.append(f'--enb_files.drb_config={CONFIG_PATHS["drb"]}')
-        srsenb_command.append(CONFIG_PATHS["enb"])
-        srsenb_command.append(
-            f'--rf.device_name={self.config.get("enb-rf-device-name")}'
+        # Fetch every input once; each self.config access goes through
+        # the model, each stored access through StoredState.
+        config = self.config
+        mme_addr = self._stored.mme_addr
+        # The bind address is derived from config and the host's
+        # interfaces; recomputing it here is a couple of C-level library
+        # calls and avoids persisting transient state in StoredState,
+        # where every stored write has to be committed to disk.
+        bind_addr = self._get_bind_address()
+        name = config.get("enb-name")
+        mcc = config.get("enb-mcc")
+        mnc = config.get("enb-mnc")
+        device_name = config.get("enb-rf-device-name")
+        device_args = config.get("enb-rf-device-args")
+        # The command only depends on these inputs; rebuilding the string
+        # on every dispatch is wasted work, so reuse the cached one until
+        # an input changes.
+        key = [mme_addr, bind_addr, name, mcc, mnc, device_name, device_args]
+        if key == self._stored.cached_srsenb_cmd_key:
+            return self._stored.cached_srsenb_cmd
+        parts = (
+            SRS_ENB_BINARY,
+            f"--enb.mme_addr={mme_addr}" if mme_addr else None,
+            f"--enb.gtp_bind_addr={bind_addr}" if bind_addr else None,
+            f"--enb.s1c_bind_addr={bind_addr}" if bind_addr else None,
+            f"--enb.name={name}",
+            f"--enb.mcc={mcc}",
+            f"--enb.mnc={mnc}",
+            SRS_ENB_FILE_ARGS,
+            f"--rf.device_name={device_name}",
+            f"--rf.device_args={device_args}",
         )
-        srsenb_command.append(
-            f'--rf.device_args={self.config.get("enb-rf-device-args")}'
-        )
-        return " ".join(srsenb_command)
+        self._stored.cached_srsenb_cmd_key = key
+        self._stored.cached_srsenb_cmd = " ".join(p for p in parts if p)
+        return self._stored.cached_srsenb_cmd
 
     def _get_srsue_command(self):
-        srsue_command = [SRS_UE_BINARY]
-        if self._stored.ue_usim_imsi:
-            srsue_command.append(f"--usim.imsi={self._stored.ue_usim_imsi}")
-            srsue_command.append(f"--usim.k={self._stored.ue_usim_k}")
-            srsue_command.append(f"--usim.opc={self._stored.ue_usim_opc}")
-        srsue_command.append(f'--usim.algo={self.config.get("ue-usim-algo")}')
-        srsue_command.append(f'--nas.apn={self.config.get("ue-nas-apn")}')
-        srsue_command.append(f'--rf.device_name={self.config.get("ue-device-name")}')
-        srsue_command.append(f'--rf.device_args={self.config.get("ue-device-args")}')
-        srsue_command.append(CONFIG_PATHS["ue"])
-        return " ".join(srsue_command)
+        config = self.config
+        imsi = self._stored.ue_usim_imsi
+        usim_k = self._stored.ue_usim_k
+        usim_opc = self._stored.ue_usim_opc
+        algo = config.get("ue-usim-algo")
+        apn = config.get("ue-nas-apn")
+        device_name = config.get("ue-device-name")
+        device_args = config.get("ue-device-args")
+        key = [imsi, usim_k, usim_opc, algo, apn, device_name, device_args]
+        if key == self._stored.cached_srsue_cmd_key:
+            return self._stored.cached_srsue_cmd
+        parts = (
+            SRS_UE_BINARY,
+            f"--usim.imsi={imsi}" if imsi else None,
+            f"--usim.k={usim_k}" if imsi else None,
+            f"--usim.opc={usim_opc}" if imsi else None,
+            f"--usim.algo={algo}",
+            f"--nas.apn={apn}",
+            f"--rf.device_name={device_name}",
+            f"--rf.device_args={device_args}",
+            SRS_UE_FILE_ARG,
+        )
+        self._stored.cached_srsue_cmd_key = key
+        self._stored.cached_srsue_cmd = " ".join(p for p in parts if p)
+        return self._stored.cached_srsue_cmd
 
     # Private functions
     def _reset_environment(self):
-        # Remove old folders (if they exist)
-        shutil.rmtree(SRC_PATH, ignore_errors=True)
-        shutil.rmtree(BUILD_PATH, ignore_errors=True)
-        shutil.rmtree(CONFIG_PATH, ignore_errors=True)
-        shutil.rmtree(SERVICE_PATH, ignore_errors=True)
-        # Create needed folders
-        os.mkdir(SRC_PATH)
-        os.mkdir(BUILD_PATH)
-        os.mkdir(CONFIG_PATH)
-        os.mkdir(SERVICE_PATH)
+        # Deleting the old source and build trees walks a huge number of
+        # inodes; renaming them aside and recreating the folders puts
+        # fresh, empty directories in place immediately, while the slow
+        # rmtree of the old trees runs in the background.
+        for path in (SRC_PATH, BUILD_PATH, CONFIG_PATH, SERVICE_PATH):
+            old_path = f"{path}.old.{os.getpid()}"
+            try:
+                os.rename(path, old_path)
+            except FileNotFoundError:
+                pass
+            else:
+                threading.Thread(
+                    target=shutil.rmtree,
+                    args=(old_path,),
+                    kwargs={"ignore_errors": True},
+                ).start()
+            os.mkdir(path)
 
     def _get_bind_address(self):
         bind_addr = None
@@ -294,17 +397,18 @@ class SrsLteCharm(CharmBase):
         return bind_addr
 
     def _get_current_status(self):
-        status_type = ActiveStatus
-        status_msg = ""
+        # Collect the message pieces in a list and join once, instead of
+        # growing a string through repeated concatenation.
+        parts = []
         if self._stored.installed:
-            status_msg = "SW installed."
+            parts = ["SW installed."]
         if self._stored.started and service_active(SRS_ENB_SERVICE):
-            status_msg = "srsenb started. "
+            parts = ["srsenb started. "]
             if mme_addr := self._stored.mme_addr:
-                status_msg += f"mme: {mme_addr}. "
+                parts.append(f"mme: {mme_addr}. ")
             if self._stored.ue_attached and service_active(SRS_UE_SERVICE):
-                status_msg += "ue attached. "
-        return status_type(status_msg)
+                parts.append("ue attached. ")
+        return ActiveStatus("".join(parts))
 
 
 if __name__ == "__main__":
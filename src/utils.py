@@ -1,36 +1,50 @@
+import os
 import subprocess
-import apt
-import netifaces
-import shutil
+import time
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, NoReturn
-from netaddr import IPNetwork, IPAddress
-from netaddr.core import AddrFormatError
+
+# netifaces and netaddr are only needed by the IP helpers below; they are
+# imported inside those functions so hooks that never look up addresses
+# (update-status above all) skip the import cost. sys.modules makes the
+# repeated imports free.
+
+
+# A single dispatch can probe the same service several times; each probe
+# forks a systemctl process. Cache the answer for a short time and drop
+# it whenever we change the service state ourselves.
+_SERVICE_ACTIVE_TTL = 1.0
+_service_active_cache = {}
 
 
 def service_active(service_name: str):
+    now = time.monotonic()
+    cached = _service_active_cache.get(service_name)
+    if cached and now - cached[0] < _SERVICE_ACTIVE_TTL:
+        return cached[1]
     result = subprocess.run(
         ["systemctl", "is-active", service_name],
         stdout=subprocess.PIPE,
         encoding="utf-8",
     )
-    return result.stdout == "active\n"
+    active = result.stdout == "active\n"
+    _service_active_cache[service_name] = (now, active)
+    return active
 
 
 def all_values_set(dictionary: Dict[str, str]) -> bool:
     return not any(v is None for v in dictionary.values())
 
 
-def install_apt(packages: List, update: bool = False) -> NoReturn:
-    cache = apt.cache.Cache()
-    if update:
-        cache.update()
-    cache.open()
-    for package in packages:
-        pkg = cache[package]
-        if not pkg.is_installed:
-            pkg.mark_install()
-    cache.commit()
+def update_apt_cache() -> NoReturn:
+    subprocess.run(["apt-get", "update"]).check_returncode()
+
+
+def install_apt_packages(packages: List) -> NoReturn:
+    # One batched invocation: apt resolves the dependency graph once and
+    # we pay the lock/dpkg startup cost once instead of per package.
+    subprocess.run(["apt-get", "install", "-y", *packages]).check_returncode()
 
 
 def git_clone(
@@ -39,7 +53,10 @@ def git_clone(
     branch: str = None,
     depth: int = None,
 ):
-    command = ["git", "clone"]
+    # Partial clone: fetch no blobs up front and only the wanted branch;
+    # git fetches file contents on demand when they are first read, so
+    # the build overlaps blob download with compilation.
+    command = ["git", "clone", "--filter=blob:none", "--single-branch"]
     if branch:
         command.append(f"--branch={branch}")
     if depth:
@@ -50,17 +67,52 @@ def git_clone(
     subprocess.run(command).check_returncode()
 
 
-def shell(command: str) -> NoReturn:
-    subprocess.run(command, shell=True).check_returncode()
+def remove_default_gw() -> NoReturn:
+    # A single netlink round-trip instead of forking a shell plus the
+    # route binary. Deleting an already-absent route stays a no-op.
+    from pyroute2 import IPRoute, NetlinkError
+
+    with IPRoute() as ipr:
+        try:
+            ipr.route("del", dst="default")
+        except NetlinkError:
+            pass
+
+
+def run_command(command: List, cwd: str = None) -> NoReturn:
+    # No shell: the command runs directly, without the extra
+    # /bin/sh fork+exec and argument re-parsing.
+    subprocess.run(command, cwd=cwd).check_returncode()
+
+
+def _copy_file(origin_path: str, destination_path: str) -> NoReturn:
+    # sendfile keeps the copy in kernel space instead of looping the data
+    # through a userspace buffer.
+    with open(origin_path, "rb") as origin:
+        with open(destination_path, "wb") as destination:
+            size = os.fstat(origin.fileno()).st_size
+            offset = 0
+            while offset < size:
+                offset += os.sendfile(
+                    destination.fileno(), origin.fileno(), offset, size - offset
+                )
 
 
 def copy_files(origin: Dict[str, str], destination: Dict[str, str]) -> NoReturn:
-    for config, origin_path in origin.items():
-        destination_path = destination[config]
-        shutil.copy(origin_path, destination_path)
+    # The files are independent, so copy them concurrently.
+    with ThreadPoolExecutor(max_workers=len(origin) or 1) as executor:
+        futures = [
+            executor.submit(_copy_file, origin_path, destination[config])
+            for config, origin_path in origin.items()
+        ]
+        for future in futures:
+            future.result()
 
 
 def get_local_ipv4_networks():
+    import netifaces
+    from netaddr import IPNetwork
+
     networks = []
     interfaces = netifaces.interfaces()
     for interface in interfaces:
@@ -73,6 +125,9 @@ def get_local_ipv4_networks():
 
 
 def is_ipv4(ip: str) -> bool:
+    from netaddr import IPAddress
+    from netaddr.core import AddrFormatError
+
     try:
         if not isinstance(ip, str) or len(ip.split(".")) != 4:
             return False
@@ -84,6 +139,7 @@ def is_ipv4(ip: str) -> bool:
 
 # Service functions
 def _systemctl(action: str, service_name: str) -> NoReturn:
+    _service_active_cache.pop(service_name, None)
     subprocess.run(["systemctl", action, service_name]).check_returncode()
 
 
@@ -108,6 +164,8 @@ def systemctl_daemon_reload():
 
 
 def ip_from_default_iface() -> str:
+    import netifaces
+
     default_gateway = netifaces.gateways()["default"]
     if netifaces.AF_INET in default_gateway:
         _, iface = netifaces.gateways()["default"][netifaces.AF_INET]
@@ -117,6 +175,9 @@ def ip_from_default_iface() -> str:
 
 
 def ip_from_iface(subnet: str) -> str:
+    from netaddr import IPNetwork
+    from netaddr.core import AddrFormatError
+
     try:
         target_network = IPNetwork(subnet)
         networks = get_local_ipv4_networks()
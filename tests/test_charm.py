@@ -1,35 +1,116 @@
 # Copyright 2020 David Garcia
 # See LICENSE file for licensing details.
 
+import os
+import tempfile
 import unittest
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 from ops.testing import Harness
-from charm import SrsLteCharm
+from charm import SrsLteCharm, APT_REQUIREMENTS, SRS_ENB_SERVICE_TEMPLATE
 
 
 class TestCharm(unittest.TestCase):
-    def test_config_changed(self):
-        harness = Harness(SrsLteCharm)
-        self.addCleanup(harness.cleanup)
-        harness.begin()
-        self.assertEqual(list(harness.charm._stored.things), [])
-        harness.update_config({"thing": "foo"})
-        self.assertEqual(list(harness.charm._stored.things), ["foo"])
-
-    def test_action(self):
-        harness = Harness(SrsLteCharm)
-        harness.begin()
-        # the harness doesn't (yet!) help much with actions themselves
-        action_event = Mock(params={"fail": ""})
-        harness.charm._on_fortune_action(action_event)
-
-        self.assertTrue(action_event.set_results.called)
-
-    def test_action_fail(self):
-        harness = Harness(SrsLteCharm)
-        harness.begin()
-        action_event = Mock(params={"fail": "fail this"})
-        harness.charm._on_fortune_action(action_event)
-
-        self.assertEqual(action_event.fail.call_args, [("fail this",)])
+    def setUp(self):
+        self.harness = Harness(SrsLteCharm)
+        self.addCleanup(self.harness.cleanup)
+        self.harness.begin()
+
+    @patch("charm.SrsLteCharm._configure_srsue_service")
+    @patch("charm.SrsLteCharm._configure_srsenb_service")
+    @patch("charm.SrsLteCharm._reset_environment")
+    @patch("charm.service_enable")
+    @patch("charm.copy_files")
+    @patch("charm.run_command")
+    @patch("charm.git_clone")
+    @patch("charm.install_apt_packages")
+    @patch("charm.update_apt_cache")
+    def test_given_list_of_packages_to_install_when_install_then_apt_packages_are_installed(
+        self,
+        mock_update_apt_cache,
+        mock_install_apt_packages,
+        mock_git_clone,
+        mock_run_command,
+        mock_copy_files,
+        mock_service_enable,
+        mock_reset_environment,
+        mock_configure_srsenb_service,
+        mock_configure_srsue_service,
+    ):
+        self.harness.charm.on.install.emit()
+
+        mock_update_apt_cache.assert_called_once()
+        mock_install_apt_packages.assert_called_once_with(APT_REQUIREMENTS)
+        self.assertTrue(self.harness.charm._stored.installed)
+
+    @patch("charm.SrsLteCharm._get_bind_address", return_value="10.45.0.1")
+    def test_given_same_inputs_when_get_srsenb_command_then_cached_command_is_reused(
+        self, _
+    ):
+        charm = self.harness.charm
+        charm._get_srsenb_command()
+        charm._stored.cached_srsenb_cmd = "cached command"
+
+        self.assertEqual(charm._get_srsenb_command(), "cached command")
+
+    @patch("charm.SrsLteCharm._get_bind_address", return_value="10.45.0.1")
+    def test_given_changed_inputs_when_get_srsenb_command_then_command_is_rebuilt(
+        self, _
+    ):
+        charm = self.harness.charm
+        charm._get_srsenb_command()
+        charm._stored.mme_addr = "10.0.0.1"
+
+        self.assertIn("--enb.mme_addr=10.0.0.1", charm._get_srsenb_command())
+
+    @patch("charm.systemctl_daemon_reload")
+    def test_given_unchanged_service_file_when_configure_service_then_daemon_reload_is_skipped(
+        self, mock_daemon_reload
+    ):
+        charm = self.harness.charm
+        with tempfile.TemporaryDirectory() as tmpdir:
+            service_path = os.path.join(tmpdir, "srsenb.service")
+            for _ in range(2):
+                charm._configure_service(
+                    command="/build/srsenb/src/srsenb",
+                    service_template=SRS_ENB_SERVICE_TEMPLATE,
+                    service_path=service_path,
+                )
+                charm._flush_daemon_reload()
+
+        mock_daemon_reload.assert_called_once()
+
+    def test_given_existing_environment_when_reset_environment_then_empty_folders_are_in_place(
+        self,
+    ):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = {
+                name: os.path.join(tmpdir, name)
+                for name in ("SRC_PATH", "BUILD_PATH", "CONFIG_PATH", "SERVICE_PATH")
+            }
+            os.mkdir(paths["SRC_PATH"])
+            with open(os.path.join(paths["SRC_PATH"], "leftover"), "w") as leftover:
+                leftover.write("old checkout")
+
+            with patch.multiple("charm", **paths), patch(
+                "charm.threading.Thread"
+            ) as mock_thread:
+                self.harness.charm._reset_environment()
+
+            for path in paths.values():
+                self.assertEqual(os.listdir(path), [])
+            # Only SRC_PATH existed, so only its old tree is deleted in
+            # the background.
+            mock_thread.assert_called_once()
+
+    @patch("charm.remove_default_gw")
+    def test_given_default_gw_when_remove_default_gw_action_then_route_is_removed(
+        self, mock_remove_default_gw
+    ):
+        event = Mock()
+        self.harness.charm._on_remove_default_gw_action(event)
+
+        mock_remove_default_gw.assert_called_once()
+        event.set_results.assert_called_once_with(
+            {"status": "ok", "message": "Default route removed!"}
+        )
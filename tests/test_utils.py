@@ -0,0 +1,98 @@
+# Copyright 2020 David Garcia
+# See LICENSE file for licensing details.
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import utils
+
+
+class TestUtils(unittest.TestCase):
+    def setUp(self):
+        utils._service_active_cache.clear()
+
+    @patch("utils.subprocess.run")
+    def test_given_recent_probe_when_service_active_then_cached_result_is_returned(
+        self, mock_run
+    ):
+        mock_run.return_value.stdout = "active\n"
+
+        self.assertTrue(utils.service_active("srsenb"))
+        self.assertTrue(utils.service_active("srsenb"))
+
+        mock_run.assert_called_once()
+
+    @patch("utils.subprocess.run")
+    def test_given_service_state_change_when_service_active_then_cache_is_invalidated(
+        self, mock_run
+    ):
+        mock_run.return_value.stdout = "active\n"
+        utils.service_active("srsenb")
+        utils.service_stop("srsenb")
+
+        mock_run.return_value.stdout = "inactive\n"
+        self.assertFalse(utils.service_active("srsenb"))
+
+    @patch("utils.subprocess.run")
+    def test_given_list_of_packages_when_install_apt_packages_then_single_batched_call(
+        self, mock_run
+    ):
+        utils.install_apt_packages(["git", "cmake", "net-tools"])
+
+        mock_run.assert_called_once_with(
+            ["apt-get", "install", "-y", "git", "cmake", "net-tools"]
+        )
+
+    @patch("utils.subprocess.run")
+    def test_given_apt_cache_when_update_apt_cache_then_apt_get_update_is_called(
+        self, mock_run
+    ):
+        utils.update_apt_cache()
+
+        mock_run.assert_called_once_with(["apt-get", "update"])
+
+    @patch("utils.subprocess.run")
+    def test_given_repo_when_git_clone_then_partial_single_branch_clone_is_made(
+        self, mock_run
+    ):
+        utils.git_clone(
+            "https://github.com/srsLTE/srsLTE.git",
+            output_folder="/srsLTE",
+            branch="release_20_10",
+            depth=1,
+        )
+
+        mock_run.assert_called_once_with(
+            [
+                "git",
+                "clone",
+                "--filter=blob:none",
+                "--single-branch",
+                "--branch=release_20_10",
+                "--depth=1",
+                "https://github.com/srsLTE/srsLTE.git",
+                "/srsLTE",
+            ]
+        )
+
+    def test_given_origin_files_when_copy_files_then_destinations_have_same_content(
+        self,
+    ):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            origin = {}
+            destination = {}
+            for config in ("enb", "ue"):
+                origin[config] = os.path.join(tmpdir, f"{config}.conf.example")
+                destination[config] = os.path.join(tmpdir, f"{config}.conf")
+                with open(origin[config], "w") as origin_file:
+                    origin_file.write(f"content of {config}")
+
+            utils.copy_files(origin=origin, destination=destination)
+
+            for config in ("enb", "ue"):
+                with open(destination[config], "r") as destination_file:
+                    self.assertEqual(
+                        destination_file.read(), f"content of {config}"
+                    )